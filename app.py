@@ -1,18 +1,35 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import httpx
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from datetime import datetime, timedelta, timezone
+import io
 import os
+import time
+import threading
 import smtplib
 from email.mime.text import MIMEText
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import streamlit as st
-from supabase import create_client, Client
+import streamlit.components.v1 as components
+from supabase import create_client, Client, ClientOptions
+from postgrest import APIError
+from postgrest.types import ReturnMethod
 import plotly.express as px
 import plotly.graph_objects as go
-from streamlit_autorefresh import st_autorefresh
+import plotly.io as pio
 
 load_dotenv()
 
+# Serialise Plotly figures (st.plotly_chart goes through plotly.io.to_json) with orjson's C encoder
+pio.json.config.default_engine = "orjson"
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="Real-Time Crypto Dashboard",
@@ -45,6 +62,21 @@ TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID = get_secret("TELEGRAM_BOT_TOKEN"), get_sec
 PRICE_DROP_ALERT_PERCENTAGE = -5.0
 VOLUME_SPIKE_ALERT_PERCENTAGE = 50.0
 ALERT_TIMEFRAME_HOURS = 1.0
+PIPELINE_INTERVAL_SECONDS = 300
+TELEGRAM_MESSAGE_LIMIT = 4096
+PIPELINE_RUN_HISTORY = 12 # Finished runs kept for sessions that have not dispatched them yet
+MAX_CHART_POINTS = 2000 # Line charts with more samples are downsampled before plotting
+PAGE_SIZE = 1000 # Rows per request when paging through a range (PostgREST's default max-rows)
+# Rows in the window behind each column of the optional coin_indicators view
+INDICATOR_VIEW_WINDOWS = {'MA_5': 5, 'MA_10': 10, 'MA_20': 20, 'MA_50': 50, 'BB_Middle': 20, 'BB_Upper': 20, 'BB_Lower': 20}
+
+# Display Formats (applied by st.dataframe in the browser, so the columns stay numeric and sortable)
+PRICE_COLUMN_CONFIG = {
+    'current_price': st.column_config.NumberColumn(format="dollar"),
+    'market_cap': st.column_config.NumberColumn(format="$%,.0f"),
+    'total_volume': st.column_config.NumberColumn(format="$%,.0f"),
+    'price_change_percentage_24h': st.column_config.NumberColumn(format="%.2f%%"),
+}
 
 # --- Database Connection ---
 # Use st.cache_resource to only create the connection once
@@ -55,14 +87,30 @@ def get_supabase_client():
         st.error("Supabase URL or Key is not configured. Please set SUPABASE_URL and SUPABASE_KEY in your secrets.")
         return None
     try:
-        client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        # Test connection by fetching a small amount of data
-        client.table('coin_price_data').select('id').limit(1).execute()
-        return client
+        # Keep a warm pool of connections so reruns reuse them instead of
+        # paying a fresh TCP+TLS handshake to Supabase on every query.
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=30, max_keepalive_connections=10, keepalive_expiry=300),
+            timeout=30.0
+        )
+        # No test query here: creating the client is offline, and connection problems
+        # surface from the first real query in load_price_data instead of delaying first paint
+        return create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=http_client))
     except Exception as e:
         st.error(f"Supabase connection failed: {e}. Please verify your Supabase URL and Key.")
         return None
 
+# --- HTTP Session ---
+@st.cache_resource
+def get_http_session():
+    """Creates a pooled requests session so CoinGecko and Telegram calls reuse keep-alive connections."""
+    session = requests.Session()
+    session.headers.update({"Accept": "application/json", "User-Agent": "rt-crypto/1.0"})
+    # Retry rate limits and gateway errors with a short backoff (urllib3 never retries the POSTs)
+    retries = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries))
+    return session
+
 # --- Notification Functions ---
 def send_email_alert(subject, body):
     """Sends an email alert."""
@@ -105,54 +153,246 @@ def send_telegram_alert(message):
         "parse_mode": "Markdown"
     }
     try:
-        response = requests.post(url, json=payload)
+        response = get_http_session().post(url, json=payload, timeout=(3, 7))
         response.raise_for_status()
         print("💬 Telegram alert sent successfully.")
     except Exception as e:
         st.error(f"Failed to send Telegram alert: {e}")
 
-def send_alert(message):
-    """Dispatches an alert to all configured channels."""
-    st.toast(message) # Always show a toast in the app
+def batch_messages(messages, limit):
+    """Joins messages with blank lines into as few chunks as fit within `limit` characters."""
+    batches = []
+    for message in messages:
+        if batches and len(batches[-1]) + 2 + len(message) <= limit:
+            batches[-1] += "\n\n" + message
+        else:
+            batches.append(message[:limit])
+    return batches
+
+def send_alerts(messages):
+    """Dispatches one pipeline run's alerts to all configured channels, one email and as few Telegram messages as possible."""
+    if not messages:
+        return
+    for message in messages:
+        st.toast(message) # Always show a toast in the app
     if st.session_state.get('email_alerts_enabled', False):
-        send_email_alert("Crypto Price Alert!", message)
+        send_email_alert("Crypto Price Alert!", "\n\n".join(messages))
     if st.session_state.get('telegram_alerts_enabled', False):
-        send_telegram_alert(message)
+        # Telegram rejects messages longer than 4096 characters, so only split when a run exceeds that
+        for batch in batch_messages(messages, TELEGRAM_MESSAGE_LIMIT):
+            send_telegram_alert(batch)
 
 # --- Initialize Connection ---
 supabase_client = get_supabase_client()
 
 # --- Data Loading Functions ---
+NUMERIC_COLUMNS = ['current_price', 'market_cap', 'total_volume', 'price_change_percentage_24h']
+
+def downcast_numeric_columns(df: pd.DataFrame):
+    """Narrows price/volume columns to float32 wherever that loses no displayed precision."""
+    # pandas only keeps the float32 result if every value round-trips within 5e-4,
+    # so large market caps and high-priced coins stay float64.
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast='float')
+    return df
+
+def utc_day_bounds(start_date, end_date):
+    """Converts an inclusive date range to [start, end) ISO timestamps at UTC midnight."""
+    range_start = datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc).isoformat()
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc).isoformat()
+    return range_start, range_end
+
+@st.cache_resource
+def get_price_history_state():
+    """Holds the in-memory 30-day history shared by every session, plus the newest timestamp it contains."""
+    return {"df": pd.DataFrame(), "watermark": None, "lock": threading.Lock()}
+
 # Use st.cache_data to cache the data itself. It will only rerun if the input (ttl) changes.
 # ttl = Time To Live. This clears the cache every 60 seconds, forcing a data refresh.
 @st.cache_data(ttl=60)
 def load_price_data(_client: Client):
-    """Loads historical price data from the database."""
+    """Loads historical price data, fetching only rows newer than the last load."""
     if _client is None:
         return pd.DataFrame()
+    state = get_price_history_state()
     try:
-        thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
-        response = _client.table('coin_price_data').select('*').gte('ingestion_timestamp', thirty_days_ago).order('ingestion_timestamp', desc=False).execute()
-        df = pd.DataFrame(response.data)
-        if not df.empty:
-            df['ingestion_timestamp'] = pd.to_datetime(df['ingestion_timestamp'], format='mixed', utc=True)
-        return df
+        with state["lock"]:
+            thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+            watermark = state["watermark"]
+
+            def fetch_page(offset):
+                query = _client.table('coin_price_data').select('*')
+                # The first load pulls the full window; afterwards only rows past the watermark are new
+                if watermark is None:
+                    query = query.gte('ingestion_timestamp', thirty_days_ago.isoformat())
+                else:
+                    query = query.gt('ingestion_timestamp', watermark)
+                # Request CSV instead of JSON so the payload is parsed by pyarrow's C reader
+                # rather than materialised as one Python dict per row.
+                # id breaks ties between the coins that share each timestamp, so page boundaries are stable.
+                return query.order('ingestion_timestamp', desc=False) \
+                    .order('id', desc=False) \
+                    .range(offset, offset + PAGE_SIZE - 1) \
+                    .csv() \
+                    .execute()
+
+            # PostgREST caps every response at its max-rows setting, so read page by page until a short page
+            pages = []
+            while True:
+                response = fetch_page(len(pages) * PAGE_SIZE)
+                if not response.data:
+                    break
+                # Keep the parsed Arrow buffers as pyarrow-backed dtypes instead of copying every column into numpy.
+                pages.append(pd.read_csv(io.StringIO(response.data), engine='pyarrow', dtype_backend='pyarrow'))
+                if len(pages[-1]) < PAGE_SIZE:
+                    break
+            if pages:
+                new_df = pd.concat(pages, ignore_index=True)
+                if not new_df.empty:
+                    # TIMESTAMPTZ values come back as uniform ISO 8601 strings, so skip per-row format inference
+                    timestamps = pd.to_datetime(new_df.pop('ingestion_timestamp'), format='ISO8601', utc=True)
+                    # Index by time (as a numpy-backed DatetimeIndex) so date lookups are binary searches on a sorted index
+                    new_df = new_df.set_index(pd.DatetimeIndex(timestamps, name='ingestion_timestamp'))
+                    state["watermark"] = new_df.index.max().isoformat()
+                    state["df"] = pd.concat([state["df"], new_df])
+
+            df = state["df"]
+            if df.empty:
+                return df
+            # Age out rows that have left the 30-day window
+            df = df.sort_index().loc[thirty_days_ago:]
+            # A handful of coins repeat across every row, so store them as categorical codes
+            for col in ('coin_id', 'name', 'symbol'):
+                df[col] = df[col].astype('category')
+            state["df"] = downcast_numeric_columns(df)
+            return state["df"]
     except Exception as e:
-        st.error(f"Failed to load price data: {e}")
+        st.error(f"Failed to load price data: {e}. Please verify your Supabase URL and Key.")
         return pd.DataFrame()
 
 @st.cache_data(ttl=60)
-def load_latest_data(_client: Client):
-    """Loads the most recent entry for each coin."""
+def load_coin_range(_client: Client, coin_name, start_date, end_date):
+    """Loads one coin's price history between two dates (inclusive, UTC), indexed by ingestion_timestamp."""
+    columns = ['ingestion_timestamp', 'current_price', 'market_cap', 'total_volume']
+    empty_df = pd.DataFrame(columns=columns[1:], index=pd.DatetimeIndex([], tz='UTC', name='ingestion_timestamp'))
+    if _client is None:
+        return empty_df
+    try:
+        range_start, range_end = utc_day_bounds(start_date, end_date)
+
+        def fetch_page(offset):
+            # Only the first page asks for the exact count, so Postgres counts the range once
+            return _client.table('coin_price_data') \
+                .select(', '.join(columns), count='exact' if offset == 0 else None) \
+                .eq('name', coin_name) \
+                .gte('ingestion_timestamp', range_start) \
+                .lt('ingestion_timestamp', range_end) \
+                .order('ingestion_timestamp', desc=False) \
+                .range(offset, offset + PAGE_SIZE - 1) \
+                .execute()
+
+        # PostgREST caps every response at its max-rows setting, so read long ranges page by page
+        # until the exact row count from the first page has been collected
+        response = fetch_page(0)
+        rows, total = response.data, response.count or 0
+        while response.data and len(rows) < total:
+            response = fetch_page(len(rows))
+            rows.extend(response.data)
+        df = pd.DataFrame(rows, columns=columns)
+        df['ingestion_timestamp'] = pd.to_datetime(df['ingestion_timestamp'], format='ISO8601', utc=True)
+        # Rows arrive in time order, so this is a sorted DatetimeIndex that joins and slices without a scan
+        return df.set_index('ingestion_timestamp')
+    except Exception as e:
+        st.error(f"Failed to load price data for {coin_name}: {e}")
+        return empty_df
+
+@st.cache_data(ttl=60)
+def load_coin_indicators(_client: Client, coin_name, start_date, end_date):
+    """Loads one coin's precomputed moving averages and Bollinger Bands from the coin_indicators view."""
     if _client is None:
         return pd.DataFrame()
+    # The view is optional. If it has not been created, return nothing and let the chart compute locally.
     try:
-        # Call the PostgreSQL function we created
-        response = _client.rpc('get_latest_coin_data', {}).execute()
-        return pd.DataFrame(response.data)
+        range_start, range_end = utc_day_bounds(start_date, end_date)
+
+        def fetch_page(offset):
+            return _client.table('coin_indicators') \
+                .select('ts, ma5, ma10, ma20, ma50, bb_mid, bb_up, bb_low') \
+                .eq('name', coin_name) \
+                .gte('ts', range_start) \
+                .lt('ts', range_end) \
+                .order('ts', desc=False) \
+                .range(offset, offset + PAGE_SIZE - 1) \
+                .execute()
+
+        # Page past PostgREST's max-rows cap the same way as the raw range, so the two stay the same length
+        rows = []
+        while True:
+            response = fetch_page(len(rows))
+            rows.extend(response.data)
+            if len(response.data) < PAGE_SIZE:
+                break
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return df
+        df = df.rename(columns={
+            'ts': 'ingestion_timestamp', 'ma5': 'MA_5', 'ma10': 'MA_10', 'ma20': 'MA_20', 'ma50': 'MA_50',
+            'bb_mid': 'BB_Middle', 'bb_up': 'BB_Upper', 'bb_low': 'BB_Lower'
+        })
+        df['ingestion_timestamp'] = pd.to_datetime(df['ingestion_timestamp'], format='ISO8601', utc=True)
+        df = df.set_index('ingestion_timestamp')
+        # The view's windows reach back before the range start, but the local computation only sees the range.
+        # Blank each window's warm-up rows so both paths draw the same lines.
+        for col, period in INDICATOR_VIEW_WINDOWS.items():
+            df.iloc[:period - 1, df.columns.get_loc(col)] = np.nan
+        return df
+    except Exception:
+        return pd.DataFrame()
+
+@st.cache_data(ttl=60)
+def load_coin_range_csv(_client: Client, coin_name, start_date, end_date):
+    """Serialises one coin's date-range slice to CSV bytes with pyarrow's C writer."""
+    df = load_coin_range(_client, coin_name, start_date, end_date)
+    buffer = pa.BufferOutputStream()
+    pa_csv.write_csv(pa.Table.from_pandas(df.reset_index(), preserve_index=False), buffer)
+    return buffer.getvalue().to_pybytes()
+
+@st.cache_data(ttl=60)
+def load_daily_ohlc(_client: Client, coin_name, start_date, end_date):
+    """Loads one coin's daily OHLC for a date range, aggregated in Postgres by the get_price_history RPC."""
+    columns = ['open', 'high', 'low', 'close']
+    empty_df = pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], tz='UTC', name='ingestion_timestamp'))
+    if _client is None:
+        return empty_df
+    try:
+        range_start, range_end = utc_day_bounds(start_date, end_date)
+        try:
+            # Only one row per day with data comes back, so there is nothing to resample or drop client-side
+            response = _client.rpc('get_price_history', {
+                'coin_name': coin_name, 'range_start': range_start, 'range_end': range_end, 'bucket': '1 day'
+            }).execute()
+        except APIError:
+            # The RPC has not been created: resample the raw range into daily buckets client-side instead
+            price_series = load_coin_range(_client, coin_name, start_date, end_date)['current_price'].astype(float)
+            return price_series.resample('D').ohlc().dropna()
+        ohlc_df = pd.DataFrame(response.data, columns=['bucket_ts'] + columns)
+        ohlc_df['bucket_ts'] = pd.to_datetime(ohlc_df['bucket_ts'], format='ISO8601', utc=True)
+        return ohlc_df.set_index('bucket_ts').rename_axis('ingestion_timestamp')
     except Exception as e:
-        st.error(f"Failed to load latest data: {e}")
+        st.error(f"Failed to load daily OHLC data for {coin_name}: {e}")
+        return empty_df
+
+@st.cache_data(ttl=60)
+def load_latest_data(_client: Client):
+    """Returns the most recent entry for each coin, taken from the cached 30-day history."""
+    # load_price_data pages through the whole window, so reusing it saves a second round-trip on every refresh
+    price_df = load_price_data(_client)
+    if price_df.empty:
         return pd.DataFrame()
+    # The history is sorted by its ingestion_timestamp index, so each coin's last row is its latest
+    latest_df = price_df.groupby('coin_id', observed=True).tail(1)
+    return latest_df.assign(ingestion_timestamp=latest_df.index).reset_index(drop=True)
 
 @st.cache_data(ttl=60)
 def load_alert_logs(_client: Client):
@@ -168,141 +408,281 @@ def load_alert_logs(_client: Client):
         # If the table doesn't exist, just return an empty DataFrame.
         return pd.DataFrame()
 
+# --- Technical Indicators ---
+def compute_indicators(prices: pd.Series, ma_periods, bb_period=None, bb_std=2):
+    """Computes moving averages and Bollinger Bands for a price series in one place.
+
+    Periods longer than the series are skipped. The Bollinger mean and std share one
+    rolling window, and the middle band reuses a matching moving average if present.
+    """
+    indicators = pd.DataFrame(index=prices.index)
+    for period in sorted(set(ma_periods)):
+        if len(prices) >= period:
+            indicators[f'MA_{period}'] = prices.rolling(window=period).mean()
+    if bb_period and len(prices) >= bb_period:
+        window = prices.rolling(window=bb_period)
+        middle = indicators[f'MA_{bb_period}'] if f'MA_{bb_period}' in indicators.columns else window.mean()
+        band_width = window.std() * bb_std
+        indicators['BB_Middle'] = middle
+        indicators['BB_Upper'] = middle + band_width
+        indicators['BB_Lower'] = middle - band_width
+    return indicators
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_computed_indicators(_client: Client, coin_name, start_date, end_date, ma_periods: tuple, bb_period=None, bb_std=2, daily=False):
+    """Computes indicators for one coin's date range once per parameter set, on raw prices or daily closes."""
+    if daily:
+        prices = load_daily_ohlc(_client, coin_name, start_date, end_date)['close']
+    else:
+        prices = load_coin_range(_client, coin_name, start_date, end_date)['current_price']
+    return compute_indicators(prices, ma_periods, bb_period, bb_std)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int):
+    """Returns the positions Largest-Triangle-Three-Buckets keeps when reducing a series to `threshold` points."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # The first and last points are always kept; the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    edges = np.append(edges, n)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket acts as the third vertex of the triangle
+        avg_x = x[end:edges[i + 2]].mean()
+        avg_y = y[end:edges[i + 2]].mean()
+        areas = np.abs((x[selected] - avg_x) * (y[start:end] - y[selected]) - (x[selected] - x[start:end]) * (avg_y - y[selected]))
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_chart_indices(_client: Client, coin_name, start_date, end_date, threshold: int):
+    """Returns the rows of one coin's date range that the line chart plots, downsampled once per range."""
+    prices = load_coin_range(_client, coin_name, start_date, end_date)['current_price']
+    return lttb_indices(prices.index.asi8.astype(float), prices.to_numpy(dtype=float), threshold)
+
 # --- Alerting Logic ---
-def check_market_cap_overtakes(new_data_df: pd.DataFrame, _client: Client):
-    """Compares the new market cap ranking with the previous one and alerts on any upward movement."""
+def check_market_cap_overtakes(new_data_df: pd.DataFrame, last_market_caps_df: pd.DataFrame):
+    """Compares the new market cap ranking with the previous one and returns an alert for any upward movement."""
+    alerts = []
+    if last_market_caps_df.empty:
+        print("ℹ️ Not enough historical data to check for market cap overtakes.")
+        return alerts
+
+    # Establish the old and new rankings as Series of rank indexed by coin_id
+    old_ranking_df = last_market_caps_df.sort_values(by='market_cap', ascending=False).reset_index(drop=True)
+    old_rank = pd.Series(old_ranking_df.index, index=old_ranking_df['coin_id'].astype(str), name='old_rank')
+    new_rank = pd.Series(new_data_df.index, index=new_data_df['coin_id'], name='new_rank') # The index is the new rank
+
+    # Compare new ranks to old ranks for coins present in both
+    ranks_df = pd.concat([old_rank, new_rank], axis=1, join='inner')
+    overtakes_df = ranks_df[ranks_df['new_rank'] < ranks_df['old_rank']]
+
+    coin_names = dict(zip(new_data_df['coin_id'], new_data_df['name']))
+    for coin_id, rank in overtakes_df['new_rank'].items():
+        overtaken_coin_id = old_ranking_df.at[rank, 'coin_id']
+        overtaken_coin_name = coin_names.get(overtaken_coin_id, overtaken_coin_id)
+        alerts.append(f"🚀 MARKET CAP ALERT: {coin_names[coin_id]} (now #{rank + 1}) has overtaken {overtaken_coin_name} (was #{rank + 1})!")
+    return alerts
+
+def fetch_alert_baselines(_client: Client, coin_ids, lookback_timestamp):
+    """Returns each coin's latest record at or before the lookback timestamp using a single request."""
+    columns = ['coin_id', 'current_price', 'total_volume']
     try:
-        # Get the previous latest records for comparison
-        response = _client.rpc('get_latest_coin_data', {}).execute()
-        last_market_caps_df = pd.DataFrame(response.data)
-
-        if last_market_caps_df.empty:
-            print("ℹ️ Not enough historical data to check for market cap overtakes.")
-            return
-
-        # Establish the old and new rankings
-        old_ranking_df = last_market_caps_df.sort_values(by='market_cap', ascending=False).reset_index(drop=True)
-        new_ranking_df = new_data_df[['coin_id', 'name']].copy().reset_index() # The index is the new rank
-
-        # Create a map of coin_id to its old rank for easy lookup
-        old_rank_map = {row.coin_id: index for index, row in old_ranking_df.iterrows()}
-
-        # Compare new ranks to old ranks
-        for _, new_row in new_ranking_df.iterrows():
-            coin_id = new_row['coin_id']
-            new_rank = new_row['index']
-            old_rank = old_rank_map.get(coin_id)
-
-            if old_rank is not None and new_rank < old_rank:
-                coin_name = new_row['name']
-                overtaken_coin_id = old_ranking_df.iloc[new_rank]['coin_id']
-                overtaken_coin_name = new_ranking_df.query(f"coin_id == '{overtaken_coin_id}'")['name'].iloc[0]
-                send_alert(f"🚀 MARKET CAP ALERT: {coin_name} (now #{new_rank + 1}) has overtaken {overtaken_coin_name} (was #{new_rank + 1})!")
-    except Exception as e:
-        st.warning(f"Could not check market cap overtakes: {e}")
+        response = _client.rpc('get_baseline_prices', {'coin_ids': coin_ids, 'lookback': lookback_timestamp}).execute()
+        return pd.DataFrame(response.data, columns=columns)
+    except APIError:
+        # The RPC has not been created: pull the 24 hours before the lookback once and keep each coin's newest row.
+        # Newest-first ordering means a server row cap can only cut off rows that would be discarded anyway.
+        window_start = (datetime.fromisoformat(lookback_timestamp) - timedelta(hours=24)).isoformat()
+        response = _client.table('coin_price_data') \
+            .select('coin_id, current_price, total_volume, ingestion_timestamp') \
+            .in_('coin_id', coin_ids) \
+            .gte('ingestion_timestamp', window_start) \
+            .lte('ingestion_timestamp', lookback_timestamp) \
+            .order('ingestion_timestamp', desc=True) \
+            .execute()
+        window_df = pd.DataFrame(response.data, columns=columns)
+        return window_df.drop_duplicates(subset='coin_id', keep='first')
 
 def check_price_volume_alerts(new_data_df: pd.DataFrame, _client: Client):
-    """Checks for price drops or volume spikes against data from a configurable timeframe."""
-    try:
-        lookback_timestamp = (datetime.now(timezone.utc) - timedelta(hours=ALERT_TIMEFRAME_HOURS)).isoformat()
-
-        for _, row in new_data_df.iterrows():
-            coin_id = row['coin_id']
-            current_price = row['current_price']
-            current_volume = row['total_volume']
-
-            # Get the most recent record from *before* the lookback period
-            response = _client.table('coin_price_data') \
-                .select('current_price, total_volume') \
-                .eq('coin_id', coin_id) \
-                .lte('ingestion_timestamp', lookback_timestamp) \
-                .order('ingestion_timestamp', desc=True) \
-                .limit(1) \
-                .execute()
+    """Checks for price drops or volume spikes against data from a configurable timeframe.
 
-            if response.data:
-                baseline_record = response.data[0]
-                last_price = baseline_record.get('current_price')
-                last_volume = baseline_record.get('total_volume')
-
-                # 1. Check for significant price drop
-                if last_price and last_price > 0:
-                    price_change_pct = ((current_price - last_price) / last_price) * 100
-                    if price_change_pct <= PRICE_DROP_ALERT_PERCENTAGE:
-                        send_alert(f"🚨 PRICE DROP: {coin_id.upper()} dropped by {price_change_pct:.2f}% to ${current_price:,.2f} in the last {ALERT_TIMEFRAME_HOURS}h.")
-
-                # 2. Check for sudden volume spike
-                if last_volume and last_volume > 0:
-                    volume_change_pct = ((current_volume - last_volume) / last_volume) * 100
-                    if volume_change_pct >= VOLUME_SPIKE_ALERT_PERCENTAGE:
-                        send_alert(f"📈 VOLUME SPIKE: {coin_id.upper()} volume up by {volume_change_pct:.2f}% in the last {ALERT_TIMEFRAME_HOURS}h.")
-            
-            # 3. Check for 24h percentage change (from API)
-            price_change_24h = row.get('price_change_percentage_24h')
-            if price_change_24h and price_change_24h <= -10.0:
-                 send_alert(f"📉 24H CHANGE: {coin_id.upper()} is down {price_change_24h:.2f}% in the last 24 hours.")
+    Returns the alerts and any warnings. A failed baseline lookup only skips the
+    hourly checks; the 24h check needs nothing from the database and still runs.
+    """
+    alerts, warnings = [], []
+    lookback_timestamp = (datetime.now(timezone.utc) - timedelta(hours=ALERT_TIMEFRAME_HOURS)).isoformat()
+
+    # The 24h change comes with the API payload, so check it before the baseline round-trip.
+    # It cannot prefilter that query: a coin that is up on the day can still fall 5% within the hour.
+    day_drops_df = new_data_df[new_data_df['price_change_percentage_24h'] <= -10.0]
+
+    try:
+        # Get the most recent record from *before* the lookback period for every coin in one call
+        baseline_df = fetch_alert_baselines(_client, new_data_df['coin_id'].tolist(), lookback_timestamp)
     except Exception as e:
-        st.warning(f"Could not check price/volume alerts: {e}")
-
-# --- Pipeline Logic (Integrated into the app) ---
-def run_pipeline_logic(_client: Client, force_run: bool = False):
-    """Main function to fetch, process, store, and alert on crypto data."""
-    if not _client:
-        st.error("Pipeline logic skipped due to database connection failure.")
-        return "Pipeline Failed", False
-
-    # Manual Throttling (replacing @st.cache_data to avoid CacheReplayClosureError)
-    if not force_run:
-        last_run_ts = st.session_state.get('pipeline_last_run_ts')
-        if last_run_ts:
-            last_run = datetime.fromisoformat(last_run_ts)
-            if (datetime.now(timezone.utc) - last_run).total_seconds() < 300:
-                return f"Pipeline last run at {last_run.strftime('%H:%M:%S')} (Cached)", False
+        warnings.append(f"Could not check price/volume alerts: {e}")
+    else:
+        baseline_df = baseline_df.astype({'current_price': float, 'total_volume': float})
+        merged_df = new_data_df.merge(baseline_df, on='coin_id', how='left', suffixes=('', '_baseline'))
+
+        # Coins without a positive baseline get NaN changes, which never trigger an alert
+        last_price = merged_df['current_price_baseline'].where(merged_df['current_price_baseline'] > 0)
+        last_volume = merged_df['total_volume_baseline'].where(merged_df['total_volume_baseline'] > 0)
+        merged_df['price_change_pct'] = ((merged_df['current_price'] - last_price) / last_price) * 100
+        merged_df['volume_change_pct'] = ((merged_df['total_volume'] - last_volume) / last_volume) * 100
+
+        # 1. Check for significant price drop
+        for row in merged_df[merged_df['price_change_pct'] <= PRICE_DROP_ALERT_PERCENTAGE].itertuples():
+            alerts.append(f"🚨 PRICE DROP: {row.coin_id.upper()} dropped by {row.price_change_pct:.2f}% to ${row.current_price:,.2f} in the last {ALERT_TIMEFRAME_HOURS}h.")
+
+        # 2. Check for sudden volume spike
+        for row in merged_df[merged_df['volume_change_pct'] >= VOLUME_SPIKE_ALERT_PERCENTAGE].itertuples():
+            alerts.append(f"📈 VOLUME SPIKE: {row.coin_id.upper()} volume up by {row.volume_change_pct:.2f}% in the last {ALERT_TIMEFRAME_HOURS}h.")
+
+    # 3. Check for 24h percentage change (from API)
+    for row in day_drops_df.itertuples():
+        alerts.append(f"📉 24H CHANGE: {row.coin_id.upper()} is down {row.price_change_percentage_24h:.2f}% in the last 24 hours.")
+    return alerts, warnings
+
+# --- Pipeline Logic (Runs on a background thread) ---
+@st.cache_resource
+def get_pipeline_executor():
+    """Creates the single worker thread shared by all sessions for pipeline runs."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline")
+
+@st.cache_resource
+def get_pipeline_state():
+    """Holds the pipeline schedule shared by all sessions, so concurrent viewers trigger one run per interval."""
+    # runs keeps the alerts of recent runs, so every session can dispatch each run once to its own channels
+    return {
+        "lock": threading.Lock(), "future": None, "next_run": 0.0, "etag": "", "status": "Pipeline has not run yet",
+        "run_id": 0, "runs": deque(maxlen=PIPELINE_RUN_HISTORY)
+    }
 
+def claim_pipeline_run(_client: Client, now: datetime):
+    """Claims this interval's run in the optional pipeline_state table, so separate app instances don't all poll."""
+    # A few seconds of slack keeps runs scheduled exactly one interval apart from skipping each other
+    stale_before = (now - timedelta(seconds=PIPELINE_INTERVAL_SECONDS - 30)).isoformat()
+    try:
+        # The conditional UPDATE is atomic, so only one instance gets the row back
+        response = _client.table('pipeline_state').update({'last_run_ts': now.isoformat()}).eq('id', 1).lt('last_run_ts', stale_before).execute()
+        return bool(response.data)
+    except APIError:
+        # Without the table, the process-wide schedule is the only guard
+        return True
+
+def run_pipeline_logic(_client: Client, http_session: requests.Session, previous_latest_df: pd.DataFrame, etag="", force=False):
+    """Main function to fetch, process, store, and alert on crypto data.
+
+    Runs on the pipeline executor, so it never calls Streamlit APIs. Alerts and
+    warnings are returned for the script thread to display and dispatch.
+    previous_latest_df is the cached latest row per coin from before this run, and
+    etag is the ETag of the last payload that was stored, and force skips the
+    cross-instance claim for a manual refresh.
+    """
+    result = {"status": "", "inserted": False, "etag": etag, "alerts": [], "warnings": []}
+    # One timestamp per run, reused for the rows, the status line and any error log
+    now = datetime.now(timezone.utc)
+    ingestion_timestamp = now.isoformat()
     url = "https://api.coingecko.com/api/v3/coins/markets"
     params = {"vs_currency": "usd", "ids": "bitcoin,ethereum,solana,cardano,dogecoin", "order": "market_cap_desc"}
 
     try:
-        response = requests.get(url, params=params)
+        if not force and not claim_pipeline_run(_client, now):
+            result["status"] = f"Skipped at {now.strftime('%H:%M:%S')}: another instance already ran this interval and sends its alerts"
+            return result
+
+        # Replay the last ETag so an unchanged payload comes back as an empty 304
+        headers = {"If-None-Match": etag} if etag else {}
+        response = http_session.get(url, params=params, headers=headers, timeout=(3, 7))
+        if response.status_code == 304:
+            result["status"] = f"No new market data at {now.strftime('%H:%M:%S')}"
+            return result
         response.raise_for_status()
         data = response.json()
         
-        df = pd.json_normalize(data)
-        df['ingestion_timestamp'] = datetime.now(timezone.utc).isoformat()
+        # The markets payload is already flat, so build the frame from just the columns we keep.
+        # Keys missing from the payload come through as nulls and fail validation below.
+        # With ingestion_timestamp added, these are exactly the columns the pipeline writes (id is generated by the database).
+        df = pd.DataFrame(data, columns=['id', 'symbol', 'name', 'current_price', 'market_cap', 'total_volume', 'price_change_percentage_24h', 'last_updated']).rename(columns={'id': 'coin_id'})
+        df['ingestion_timestamp'] = ingestion_timestamp
 
         # --- Data Validation ---
-        required_cols = ['id', 'current_price', 'market_cap', 'total_volume']
-        if not all(col in df.columns for col in required_cols) or df[required_cols].isnull().values.any():
+        required_cols = ['coin_id', 'current_price', 'market_cap', 'total_volume']
+        if df.empty or df[required_cols].isnull().values.any():
             raise ValueError("Invalid data from API: missing columns or null values.")
 
-        # --- Column Renaming ---
-        df = df[['id', 'symbol', 'name', 'current_price', 'market_cap', 'total_volume', 'price_change_percentage_24h', 'last_updated', 'ingestion_timestamp']]
-        df.columns = ['coin_id', 'symbol', 'name', 'current_price', 'market_cap', 'total_volume', 'price_change_percentage_24h', 'last_updated', 'ingestion_timestamp']
-
         # --- Run Full Alert Checks ---
-        check_market_cap_overtakes(df, _client)
-        check_price_volume_alerts(df, _client)
-        
-        # Append new data to the database table
-        records_to_insert = df.to_dict(orient='records')
-        _client.table('coin_price_data').insert(records_to_insert).execute()
-        st.session_state['pipeline_last_run_ts'] = datetime.now(timezone.utc).isoformat()
-        return f"Pipeline run successful at {datetime.now(timezone.utc).strftime('%H:%M:%S')}", True
+        # The baseline lookup only reads rows from before the lookback window, so it can overlap the insert
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="alerts") as alert_executor:
+            price_volume_future = alert_executor.submit(check_price_volume_alerts, df, _client)
+            try:
+                result["alerts"] += check_market_cap_overtakes(df, previous_latest_df)
+            except Exception as e:
+                result["warnings"].append(f"Could not check market cap overtakes: {e}")
+
+            try:
+                # Append new data to the database table in a single bulk request.
+                # returning=minimal stops PostgREST from echoing every inserted row back.
+                # df already holds exactly the table's columns, and to_dict yields native Python scalars for the JSON encoder.
+                records_to_insert = df.to_dict(orient='records')
+                _client.table('coin_price_data').insert(records_to_insert, returning=ReturnMethod.minimal).execute()
+                result["inserted"] = True
+                # Only remember the ETag once its payload is stored, so a failed insert is retried next run
+                result["etag"] = response.headers.get("ETag", "")
+            finally:
+                # Price/volume alerts are reported even if the insert fails
+                try:
+                    price_volume_alerts, price_volume_warnings = price_volume_future.result()
+                    result["alerts"] += price_volume_alerts
+                    result["warnings"] += price_volume_warnings
+                except Exception as e:
+                    result["warnings"].append(f"Could not check price/volume alerts: {e}")
+
+        # Bring the optional coin_indicators view up to date with the new rows
+        try:
+            _client.rpc('refresh_coin_indicators', {}).execute()
+        except Exception as e:
+            print(f"ℹ️ coin_indicators view not refreshed: {e}")
+        result["status"] = f"Pipeline run successful at {now.strftime('%H:%M:%S')}"
 
     except requests.exceptions.RequestException as e:
-        error_details = {"error_message": str(e), "source": "CoinGecko API", "timestamp": datetime.now(timezone.utc).isoformat()}
-        _client.table('api_error_logs').insert(error_details).execute()
-        return f"API Error: {e}", True
+        result["status"] = f"API Error: {e}"
+        error_details = {"error_message": str(e), "source": "CoinGecko API", "timestamp": ingestion_timestamp}
+        # The log table is optional and the database may be down too, so logging must not fail the run
+        try:
+            _client.table('api_error_logs').insert(error_details, returning=ReturnMethod.minimal).execute()
+        except Exception as log_error:
+            print(f"ℹ️ API error not logged: {log_error}")
     except Exception as e:
-        return f"An unexpected Error occurred in pipeline: {e}", True
+        result["status"] = f"An unexpected Error occurred in pipeline: {e}"
+    return result
+
+
+# --- Auto Refresh ---
+# A tiny local component instead of streamlit-autorefresh, so hidden browser tabs stop triggering reruns
+_visible_autorefresh = components.declare_component(
+    "visible_autorefresh", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "visible_autorefresh")
+)
+
+def visible_autorefresh(interval, hidden_interval, key):
+    """Reruns the app every `interval` milliseconds while the browser tab is visible, and every `hidden_interval` while it is hidden."""
+    return _visible_autorefresh(interval=interval, hidden_interval=hidden_interval, key=key, default=0)
 
 
 # --- Dashboard UI ---
 st.title("🚀 Real-Time Crypto Price Dashboard")
-st.markdown(f"_Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}_")
+last_updated_placeholder = st.empty() # Filled in once the price history has been loaded
 
-# Run the auto-refresh component every 65 seconds (65000 milliseconds)
-st_autorefresh(interval=65 * 1000, key="data_refresher")
+# Run the auto-refresh component every 65 seconds (65000 milliseconds).
+# A hidden tab drops to one rerun per pipeline interval: runs and alerts are only scheduled from reruns,
+# so it keeps collecting data and sending alerts without redrawing charts nobody is looking at.
+visible_autorefresh(interval=65 * 1000, hidden_interval=PIPELINE_INTERVAL_SECONDS * 1000, key="data_refresher")
 
 # --- Initialize Session State for Alert Toggles ---
 if 'email_alerts_enabled' not in st.session_state:
@@ -317,30 +697,91 @@ if 'user_telegram_id' not in st.session_state:
 # --- Sidebar and Pipeline Execution ---
 st.sidebar.title("⚙️ Pipeline Control")
 
-# Default to a throttled run
-force_pipeline = False
-
 # Add a button to force the run
-if st.sidebar.button("🔄 Refresh Data Now"):
-    force_pipeline = True
+force_pipeline = st.sidebar.button("🔄 Refresh Data Now")
+if force_pipeline:
     st.toast("Requesting immediate data refresh...")
 
-# Trigger the pipeline logic.
-pipeline_status, pipeline_ran = run_pipeline_logic(supabase_client, force_run=force_pipeline)
-st.sidebar.write(pipeline_status)
-
-# If the pipeline was forced and ran, we need to clear caches and rerun the script
-if force_pipeline and pipeline_ran:
-    load_price_data.clear()
-    load_latest_data.clear()
-    load_alert_logs.clear()
-    st.rerun()
+# Schedule the pipeline on the background executor instead of running it inline,
+# so page renders never wait on the CoinGecko round-trip or the database write.
+if not supabase_client:
+    st.error("Pipeline logic skipped due to database connection failure.")
+    st.session_state.pipeline_status = "Pipeline Failed"
+else:
+    # The schedule lives in a process-wide resource, so every open session shares one run per interval
+    pipeline_state = get_pipeline_state()
+    # A new session only dispatches runs that finish after it opened
+    st.session_state.setdefault('last_dispatched_run', pipeline_state["run_id"])
+    run_due = force_pipeline or time.time() >= pipeline_state["next_run"]
+    # The cached latest rows are the "before" ranking, so the overtake check needs no extra RPC.
+    # They are read before taking the lock, so a slow query never stalls the other sessions.
+    previous_latest_df = load_latest_data(supabase_client) if run_due and pipeline_state["future"] is None else None
+    with pipeline_state["lock"]:
+        pipeline_future = pipeline_state["future"]
+        if pipeline_future is None and previous_latest_df is not None:
+            pipeline_future = get_pipeline_executor().submit(run_pipeline_logic, supabase_client, get_http_session(), previous_latest_df, pipeline_state["etag"], force_pipeline)
+            pipeline_state["future"] = pipeline_future
+            pipeline_state["next_run"] = time.time() + PIPELINE_INTERVAL_SECONDS
+            pipeline_state["status"] = "Pipeline running in the background..."
+
+    # A forced refresh waits for its run; scheduled runs are picked up once finished
+    collected = pipeline_future is not None and (force_pipeline or pipeline_future.done())
+    if collected:
+        # Every session sees the finished run, but only the first to claim it records it and clears caches.
+        # The slot is freed before reading the result, so a run that raised can never block the next one.
+        with pipeline_state["lock"]:
+            claimed = pipeline_state["future"] is pipeline_future
+            if claimed:
+                pipeline_state["future"] = None
+        try:
+            pipeline_result = pipeline_future.result()
+        except Exception as e:
+            pipeline_result = {"status": f"An unexpected Error occurred in pipeline: {e}", "inserted": False, "etag": pipeline_state["etag"], "alerts": [], "warnings": []}
+        if claimed:
+            with pipeline_state["lock"]:
+                pipeline_state["status"] = pipeline_result["status"]
+                pipeline_state["etag"] = pipeline_result["etag"]
+                pipeline_state["run_id"] += 1
+                pipeline_state["runs"].append({"id": pipeline_state["run_id"], "alerts": pipeline_result["alerts"], "warnings": pipeline_result["warnings"]})
+
+            # Clear the caches only when new rows were written
+            if pipeline_result["inserted"]:
+                load_price_data.clear()
+                load_coin_range.clear()
+                load_coin_indicators.clear()
+                load_coin_range_csv.clear()
+                load_daily_ohlc.clear()
+                load_computed_indicators.clear()
+                load_chart_indices.clear()
+                load_latest_data.clear()
+                load_alert_logs.clear()
+
+    # Each session dispatches every finished run once, to its own alert channels and recipients
+    with pipeline_state["lock"]:
+        new_runs = [run for run in pipeline_state["runs"] if run["id"] > st.session_state.last_dispatched_run]
+    for run in new_runs:
+        for warning in run["warnings"]:
+            st.warning(warning)
+        send_alerts(run["alerts"])
+        st.session_state.last_dispatched_run = run["id"]
+
+    # A forced run also reruns the script
+    if collected and force_pipeline:
+        st.rerun()
+
+    st.session_state.pipeline_status = pipeline_state["status"]
+
+st.sidebar.write(st.session_state.pipeline_status)
 
 # Load data (will be fresh if caches were just cleared)
 price_df = load_price_data(supabase_client)
 latest_df = load_latest_data(supabase_client)
 logs_df = load_alert_logs(supabase_client)
 
+# Show when the newest stored data was ingested, whichever instance wrote it
+if not price_df.empty:
+    last_updated_placeholder.markdown(f"_Last updated: {price_df.index.max().strftime('%Y-%m-%d %H:%M:%S')} UTC_")
+
 if price_df.empty or latest_df.empty:
     st.warning("No data found in the database. Is the data pipeline running?")
 else:
@@ -369,16 +810,9 @@ else:
     with tab1:
         # --- Overview Tab ---
         st.subheader("Latest Prices")
-        
-        # Format the latest data for better display
-        latest_df_display = latest_df.copy()
-        latest_df_display['current_price'] = latest_df_display['current_price'].apply(lambda x: f"${x:,.2f}")
-        latest_df_display['market_cap'] = latest_df_display['market_cap'].apply(lambda x: f"${x:,.0f}")
-        latest_df_display['total_volume'] = latest_df_display['total_volume'].apply(lambda x: f"${x:,.0f}")
-        latest_df_display['price_change_percentage_24h'] = latest_df_display['price_change_percentage_24h'].apply(lambda x: f"{x:.2f}%")
-        
         st.dataframe(
-            latest_df_display.set_index('name'),
+            latest_df.set_index('name'),
+            column_config=PRICE_COLUMN_CONFIG,
             width="stretch"
         )
 
@@ -389,16 +823,18 @@ else:
     with tab2:
         # --- Price Analysis Tab ---
         st.subheader("Price History")
-        coin_options = price_df['name'].unique()
+        # Offer only coins with rows in the 30-day history; a coin no longer fetched would have no dates to pick.
+        # name is categorical, so unique() works on the integer codes rather than the strings.
+        coin_options = price_df['name'].unique().to_numpy()
         selected_coin = st.selectbox("Select a coin to visualize:", coin_options)
 
         if selected_coin:
-            chart_df = price_df[price_df['name'] == selected_coin]
+            coin_timestamps = price_df.index[price_df['name'] == selected_coin]
 
             # --- Date Range Selector ---
             # Get the min and max dates from the data for the selected coin
-            min_date = chart_df['ingestion_timestamp'].min().date()
-            max_date = chart_df['ingestion_timestamp'].max().date()
+            min_date = coin_timestamps.min().date()
+            max_date = coin_timestamps.max().date()
 
             date_range = st.date_input(
                 "Select date range to analyze:",
@@ -408,11 +844,9 @@ else:
                 format="YYYY-MM-DD"
             )
 
-            # Filter the dataframe based on the selected date range
-            if len(date_range) == 2:
-                start_date, end_date = date_range
-                mask = (chart_df['ingestion_timestamp'].dt.date >= start_date) & (chart_df['ingestion_timestamp'].dt.date <= end_date)
-                chart_df = chart_df.loc[mask]
+            # Fetch only the selected coin and date range from the database
+            start_date, end_date = date_range if len(date_range) == 2 else (min_date, max_date)
+            chart_df = load_coin_range(supabase_client, selected_coin, start_date, end_date)
             
             # --- Chart Type Selector ---
             st.subheader("Chart Options")
@@ -452,30 +886,34 @@ else:
             # --- Chart Rendering ---
             st.subheader(f"{chart_type}")
             if chart_type == "Line Chart":
-                # Calculate indicators on raw data
-                for period in selected_mas:
-                    if len(chart_df) >= period: chart_df[f'MA_{period}'] = chart_df['current_price'].rolling(window=period).mean()
-                if show_bb and len(chart_df) >= bb_period:
-                    chart_df['BB_Middle'] = chart_df['current_price'].rolling(window=bb_period).mean()
-                    rolling_std = chart_df['current_price'].rolling(window=bb_period).std()
-                    chart_df['BB_Upper'] = chart_df['BB_Middle'] + (rolling_std * bb_std)
-                    chart_df['BB_Lower'] = chart_df['BB_Middle'] - (rolling_std * bb_std)
-
-                fig = px.line(chart_df, x='ingestion_timestamp', y='current_price', title=f'{selected_coin} Price Over Time', markers=True)
+                # Use the indicators the pipeline maintains in the database when they cover every row,
+                # otherwise calculate them on the raw data
+                stored_indicators = load_coin_indicators(supabase_client, selected_coin, start_date, end_date)
+                if not chart_df.empty and len(stored_indicators) == len(chart_df):
+                    indicator_cols = [f'MA_{period}' for period in selected_mas] + (['BB_Middle', 'BB_Upper', 'BB_Lower'] if show_bb else [])
+                    chart_df = chart_df.join(stored_indicators[indicator_cols])
+                else:
+                    chart_df = chart_df.join(load_computed_indicators(supabase_client, selected_coin, start_date, end_date, tuple(sorted(selected_mas)), bb_period if show_bb else None, bb_std))
+
+                # Downsample long histories for plotting only; the data table below still uses every row
+                plot_df = chart_df
+                if len(chart_df) > MAX_CHART_POINTS:
+                    plot_df = chart_df.iloc[load_chart_indices(supabase_client, selected_coin, start_date, end_date, MAX_CHART_POINTS)]
+
+                fig = px.line(plot_df, x=plot_df.index, y='current_price', title=f'{selected_coin} Price Over Time', markers=True)
                 
                 # Add traces for indicators
                 for period in selected_mas:
-                    if f'MA_{period}' in chart_df.columns: fig.add_scatter(x=chart_df['ingestion_timestamp'], y=chart_df[f'MA_{period}'], mode='lines', name=f'{period}-Period MA')
-                if show_bb and 'BB_Middle' in chart_df.columns:
-                    fig.add_scatter(x=chart_df['ingestion_timestamp'], y=chart_df['BB_Upper'], mode='lines', line=dict(color='gray', dash='dash'), name='BB Upper')
-                    fig.add_scatter(x=chart_df['ingestion_timestamp'], y=chart_df['BB_Middle'], mode='lines', line=dict(color='gray', dash='dash'), name='BB Middle')
-                    fig.add_scatter(x=chart_df['ingestion_timestamp'], y=chart_df['BB_Lower'], mode='lines', line=dict(color='gray', dash='dash'), name='BB Lower')
+                    if f'MA_{period}' in plot_df.columns: fig.add_scatter(x=plot_df.index, y=plot_df[f'MA_{period}'], mode='lines', name=f'{period}-Period MA')
+                if show_bb and 'BB_Middle' in plot_df.columns:
+                    fig.add_scatter(x=plot_df.index, y=plot_df['BB_Upper'], mode='lines', line=dict(color='gray', dash='dash'), name='BB Upper')
+                    fig.add_scatter(x=plot_df.index, y=plot_df['BB_Middle'], mode='lines', line=dict(color='gray', dash='dash'), name='BB Middle')
+                    fig.add_scatter(x=plot_df.index, y=plot_df['BB_Lower'], mode='lines', line=dict(color='gray', dash='dash'), name='BB Lower')
 
             elif chart_type == "Candlestick Chart":
                 if not chart_df.empty:
                     # Resample data to daily OHLC
-                    ohlc_df = chart_df.set_index('ingestion_timestamp')['current_price'].resample('D').ohlc()
-                    ohlc_df = ohlc_df.dropna() # Remove days with no data
+                    ohlc_df = load_daily_ohlc(supabase_client, selected_coin, start_date, end_date)
 
                     fig = go.Figure(data=[go.Candlestick(x=ohlc_df.index,
                                     open=ohlc_df['open'], high=ohlc_df['high'],
@@ -483,13 +921,7 @@ else:
                                     name='Price')])
 
                     # Calculate indicators on resampled (daily close) data
-                    for period in selected_mas:
-                        if len(ohlc_df) >= period: ohlc_df[f'MA_{period}'] = ohlc_df['close'].rolling(window=period).mean()
-                    if show_bb and len(ohlc_df) >= bb_period:
-                        ohlc_df['BB_Middle'] = ohlc_df['close'].rolling(window=bb_period).mean()
-                        rolling_std = ohlc_df['close'].rolling(window=bb_period).std()
-                        ohlc_df['BB_Upper'] = ohlc_df['BB_Middle'] + (rolling_std * bb_std)
-                        ohlc_df['BB_Lower'] = ohlc_df['BB_Middle'] - (rolling_std * bb_std)
+                    ohlc_df = ohlc_df.join(load_computed_indicators(supabase_client, selected_coin, start_date, end_date, tuple(sorted(selected_mas)), bb_period if show_bb else None, bb_std, daily=True))
 
                     # Add traces for indicators
                     for period in selected_mas:
@@ -510,25 +942,19 @@ else:
             st.subheader("Filtered Data View")
 
             # Add a download button for the raw filtered data
-            csv = chart_df.to_csv(index=False).encode('utf-8')
+            # A callable defers the CSV export until the button is clicked, instead of building it on every rerun.
+            # Deferred downloads need Streamlit 1.52+, the floor in requirements.txt.
             st.download_button(
                label="Download Data as CSV",
-               data=csv,
+               data=lambda: load_coin_range_csv(supabase_client, selected_coin, start_date, end_date),
                file_name=f'{selected_coin}_price_data.csv',
                mime='text/csv',
             )
 
             if not chart_df.empty:
-                # Select and format a subset of columns for better readability
-                display_df = chart_df[['ingestion_timestamp', 'current_price', 'market_cap', 'total_volume']].copy()
-                display_df['current_price'] = display_df['current_price'].apply(lambda x: f"${x:,.2f}")
-                display_df['market_cap'] = display_df['market_cap'].apply(lambda x: f"${x:,.0f}")
-                display_df['total_volume'] = display_df['total_volume'].apply(lambda x: f"${x:,.0f}")
-                display_df = display_df.set_index('ingestion_timestamp')
-
                 # --- Pagination Logic ---
                 rows_per_page = 15
-                total_rows = len(display_df)
+                total_rows = len(chart_df)
                 total_pages = (total_rows // rows_per_page) + (1 if total_rows % rows_per_page > 0 else 0)
 
                 col1, col2 = st.columns([1, 3])
@@ -539,9 +965,11 @@ else:
 
                 start_idx = (page_number - 1) * rows_per_page
                 end_idx = start_idx + rows_per_page
-                paginated_df = display_df.iloc[start_idx:end_idx]
+                # Cut the page out first, then select a subset of columns for better readability;
+                # formatting comes from PRICE_COLUMN_CONFIG, so only these rows are ever sent to the browser
+                paginated_df = chart_df.iloc[start_idx:end_idx][['current_price', 'market_cap', 'total_volume']]
                 
-                st.dataframe(paginated_df, width="stretch")
+                st.dataframe(paginated_df, column_config=PRICE_COLUMN_CONFIG, width="stretch")
 
 
     with tab3: